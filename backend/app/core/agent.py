@@ -1,30 +1,43 @@
+from typing import Dict, Any
 from agno.agent import Agent
-from agno.models.openai import OpenAIChat
+from agno.storage.postgres import PostgresStorage
 from agno.storage.sqlite import SqliteStorage
-from agno.tools.calculator import CalculatorTools
 from ..schemas.chat import StructuredAgentResponse
+from .analysis_tools import AnalysisTools
 from .config import settings
+from .database import engine
+from .scheduler import ScheduledOpenAIChat
 
-agent = Agent(
-    name="Excel Analysis Assistant",
-    model=OpenAIChat(id=settings.openai_model),
-    tools=[
-        CalculatorTools(
-            add=True,
-            subtract=True,
-            multiply=True,
-            divide=True,
-            exponentiate=True,
-            factorial=True,
-            is_prime=True,
-            square_root=True,
-        )
-    ],
-    show_tool_calls=True,
-    response_model=StructuredAgentResponse,
-    use_json_mode=True,
-    storage=SqliteStorage(table_name="chat_sessions", db_file=settings.database_url.replace("sqlite:///", "")),
-    add_history_to_messages=True,
-    markdown=True,
-    num_history_responses=5,
-)
\ No newline at end of file
+def create_session_storage():
+    """
+    Chat session storage on the shared database engine, so every worker sees the same history
+    """
+    if engine.dialect.name == "postgresql":
+        return PostgresStorage(table_name="chat_sessions", db_engine=engine)
+    return SqliteStorage(table_name="chat_sessions", db_engine=engine)
+
+session_storage = create_session_storage()
+
+def create_agent(tables: Dict[str, Any] = None, stats: Dict[str, Any] = None) -> Agent:
+    """
+    Create a chat agent for a single request
+
+    The agent's analysis tools answer from the tables' precomputed statistics
+    and run exact calculations against the given tables.
+
+    Agents keep per-session state in memory, so a fresh agent is built for each
+    run and loads the session history from the shared storage. This keeps
+    workers from answering with a stale copy of a session another worker updated.
+    """
+    return Agent(
+        name="Excel Analysis Assistant",
+        model=ScheduledOpenAIChat(id=settings.openai_model),
+        tools=[AnalysisTools(tables=tables or {}, stats=stats)],
+        show_tool_calls=True,
+        response_model=StructuredAgentResponse,
+        use_json_mode=True,
+        storage=session_storage,
+        add_history_to_messages=True,
+        markdown=True,
+        num_history_responses=5,
+    )
@@ -0,0 +1,499 @@
+"""
+Restricted analysis pipelines over uploaded tables
+
+A pipeline is a JSON object the agent submits instead of many calculator calls:
+
+    {
+        "table": "CustomerData",
+        "filter": "TotalOrders > 0 and Region in ['North', 'East']",
+        "compute": {"order_value": "TotalSpent / TotalOrders"},
+        "group_by": ["Region"],
+        "aggregate": {"avg_order_value": ["mean", "order_value"], "customers": ["count", "*"]},
+        "sort": ["-avg_order_value"],
+        "limit": 10
+    }
+
+Expressions are parsed with `ast` and only a small whitelist of node types,
+operators and functions is allowed, so no attribute access, imports or calls
+into arbitrary Python are possible. Pipelines run in a separate interpreter
+(`python -m app.core.analysis`) with CPU, memory and output limits; this module
+only imports the standard library so that the sandbox starts quickly.
+
+Filters are first checked against the table's zone maps (see app.core.sketches)
+so that blocks of rows that cannot match are skipped without being scanned.
+"""
+import ast
+import json
+import math
+import operator
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from .sketches import block_may_match
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+class AnalysisError(Exception):
+    """Raised for invalid pipelines and failed or over-limit sandbox runs"""
+
+def _none_safe(function: Callable) -> Callable:
+    def wrapper(*args):
+        if any(arg is None for arg in args):
+            return None
+        return function(*args)
+    return wrapper
+
+def _safe_pow(base, exponent):
+    if isinstance(exponent, (int, float)) and abs(exponent) > 100:
+        raise AnalysisError("Exponent too large")
+    return base ** exponent
+
+def _safe_div(left, right):
+    return None if right == 0 else left / right
+
+def _to_number(value):
+    if value is None or isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    text = str(value).replace(",", "").strip()
+    # int() first so large integers stay exact instead of being rounded through a float
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        number = float(text)
+    except ValueError:
+        return None
+    if not math.isfinite(number):
+        return None
+    return int(number) if number.is_integer() else number
+
+BINARY_OPERATORS = {
+    ast.Add: _none_safe(operator.add),
+    ast.Sub: _none_safe(operator.sub),
+    ast.Mult: _none_safe(operator.mul),
+    ast.Div: _none_safe(_safe_div),
+    ast.FloorDiv: _none_safe(lambda left, right: None if right == 0 else left // right),
+    ast.Mod: _none_safe(lambda left, right: None if right == 0 else left % right),
+    ast.Pow: _none_safe(_safe_pow),
+}
+
+UNARY_OPERATORS = {
+    ast.USub: _none_safe(operator.neg),
+    ast.UAdd: _none_safe(operator.pos),
+    ast.Not: operator.not_,
+}
+
+COMPARE_OPERATORS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: _none_safe(operator.lt),
+    ast.LtE: _none_safe(operator.le),
+    ast.Gt: _none_safe(operator.gt),
+    ast.GtE: _none_safe(operator.ge),
+    ast.In: lambda left, right: left in right,
+    ast.NotIn: lambda left, right: left not in right,
+}
+
+FUNCTIONS = {
+    "abs": _none_safe(abs),
+    "round": _none_safe(lambda value, digits=0: round(value, int(digits))),
+    "min": lambda *values: min((value for value in values if value is not None), default=None),
+    "max": lambda *values: max((value for value in values if value is not None), default=None),
+    "len": _none_safe(len),
+    "lower": _none_safe(lambda value: str(value).lower()),
+    "upper": _none_safe(lambda value: str(value).upper()),
+    "str": _none_safe(str),
+    "num": _to_number,
+    "coalesce": lambda *values: next((value for value in values if value is not None), None),
+    "contains": _none_safe(lambda value, part: str(part) in str(value)),
+    "startswith": _none_safe(lambda value, prefix: str(value).startswith(str(prefix))),
+    "substr": _none_safe(lambda value, start, end=None: str(value)[int(start):None if end is None else int(end)]),
+}
+
+def compile_expression(expression: str) -> Callable[[Dict[str, Any]], Any]:
+    """
+    Compile a restricted expression into a function of a row
+
+    Column names are referenced directly (`Revenue * 2`) or through
+    `col("Column With Spaces")`. Missing or empty values propagate as None.
+
+    Raises:
+        AnalysisError: If the expression uses anything outside the whitelist
+    """
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError as e:
+        raise AnalysisError(f"Invalid expression {expression!r}: {e.msg}") from e
+
+    def build(node: ast.AST) -> Callable[[Dict[str, Any]], Any]:
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str, bool, type(None))):
+            value = node.value
+            return lambda row: value
+        if isinstance(node, ast.Name):
+            name = node.id
+            return lambda row: row.get(name)
+        if isinstance(node, (ast.List, ast.Tuple)):
+            items = [build(item) for item in node.elts]
+            return lambda row: [item(row) for item in items]
+        if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+            op, left, right = BINARY_OPERATORS[type(node.op)], build(node.left), build(node.right)
+            return lambda row: op(left(row), right(row))
+        if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+            op, operand = UNARY_OPERATORS[type(node.op)], build(node.operand)
+            return lambda row: op(operand(row))
+        if isinstance(node, ast.BoolOp):
+            values = [build(value) for value in node.values]
+            if isinstance(node.op, ast.And):
+                return lambda row: all(value(row) for value in values)
+            return lambda row: any(value(row) for value in values)
+        if isinstance(node, ast.Compare) and all(type(op) in COMPARE_OPERATORS for op in node.ops):
+            left = build(node.left)
+            pairs = [(COMPARE_OPERATORS[type(op)], build(comparator)) for op, comparator in zip(node.ops, node.comparators)]
+
+            def compare(row):
+                current = left(row)
+                for op, comparator in pairs:
+                    other = comparator(row)
+                    if not op(current, other):
+                        return False
+                    current = other
+                return True
+            return compare
+        if isinstance(node, ast.IfExp):
+            test, body, orelse = build(node.test), build(node.body), build(node.orelse)
+            return lambda row: body(row) if test(row) else orelse(row)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            if node.func.id == "col" and len(node.args) == 1 and isinstance(node.args[0], ast.Constant):
+                name = node.args[0].value
+                return lambda row: row.get(name)
+            if node.func.id in FUNCTIONS:
+                function, args = FUNCTIONS[node.func.id], [build(arg) for arg in node.args]
+                return lambda row: function(*(arg(row) for arg in args))
+        raise AnalysisError(f"Unsupported syntax in expression {expression!r}: {ast.dump(node)[:80]}")
+
+    return build(tree.body)
+
+COMPARE_SYMBOLS = {ast.Eq: "==", ast.Lt: "<", ast.LtE: "<=", ast.Gt: ">", ast.GtE: ">="}
+MIRRORED_SYMBOLS = {"==": "==", "<": ">", "<=": ">=", ">": "<", ">=": "<="}
+
+def _column_conditions(expression: str) -> List[tuple]:
+    """
+    Extract `column <op> constant` conditions that every matching row must satisfy
+
+    Only top-level `and` terms are used; anything else is ignored, which only
+    makes pruning less effective, never wrong.
+    """
+    tree = ast.parse(expression, mode="eval").body
+    terms = tree.values if isinstance(tree, ast.BoolOp) and isinstance(tree.op, ast.And) else [tree]
+
+    def column_name(node):
+        if isinstance(node, ast.Name):
+            return node.id
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "col"
+                and len(node.args) == 1 and isinstance(node.args[0], ast.Constant)):
+            return node.args[0].value
+        return None
+
+    def constant(node):
+        if isinstance(node, ast.Constant):
+            return True, node.value
+        if (isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub) and isinstance(node.operand, ast.Constant)
+                and isinstance(node.operand.value, (int, float))):
+            return True, -node.operand.value
+        return False, None
+
+    conditions = []
+    for term in terms:
+        if not isinstance(term, ast.Compare) or len(term.ops) != 1:
+            continue
+        op, left, right = term.ops[0], term.left, term.comparators[0]
+        if isinstance(op, ast.In) and column_name(left) and isinstance(right, (ast.List, ast.Tuple)):
+            values = [constant(item) for item in right.elts]
+            if all(is_constant for is_constant, _ in values):
+                conditions.append((column_name(left), "in", [value for _, value in values]))
+            continue
+        if type(op) not in COMPARE_SYMBOLS:
+            continue
+        symbol = COMPARE_SYMBOLS[type(op)]
+        is_constant, value = constant(right)
+        if column_name(left) and is_constant:
+            conditions.append((column_name(left), symbol, value))
+            continue
+        is_constant, value = constant(left)
+        if column_name(right) and is_constant:
+            conditions.append((column_name(right), MIRRORED_SYMBOLS[symbol], value))
+    return conditions
+
+def prune_blocks(rows: List[Dict[str, Any]], expression: str, zone_maps: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drop the blocks of rows whose zone maps prove that the filter cannot match"""
+    conditions = _column_conditions(expression)
+    if not conditions:
+        return rows
+
+    def may_match(zone_map):
+        for column, symbol, value in conditions:
+            zone = zone_map["columns"].get(column)
+            if zone is None:
+                continue
+            if symbol == "in":
+                if not any(block_may_match(zone, "==", item) for item in value):
+                    return False
+            elif not block_may_match(zone, symbol, value):
+                return False
+        return True
+
+    kept = []
+    for zone_map in zone_maps:
+        if may_match(zone_map):
+            kept.extend(rows[zone_map["start"]:zone_map["end"]])
+    return kept
+
+def _numbers(values: List[Any]) -> List[Any]:
+    numbers = [_to_number(value) for value in values]
+    return [number for number in numbers if number is not None]
+
+def _skipped(values: List[Any]) -> int:
+    """Count the non-empty values that are not numbers"""
+    return sum(1 for value in values if value is not None and value != "" and _to_number(value) is None)
+
+def _sum(values: List[Any]) -> Any:
+    numbers = _numbers(values)
+    if not numbers:
+        return None
+    if all(isinstance(number, int) for number in numbers):
+        return sum(numbers)
+    return math.fsum(numbers)
+
+def _mean(values: List[Any]) -> Optional[float]:
+    numbers = _numbers(values)
+    return _sum(numbers) / len(numbers) if numbers else None
+
+AGGREGATES: Dict[str, Callable[[List[Any]], Any]] = {
+    "count": lambda values: sum(1 for value in values if value is not None),
+    "count_distinct": lambda values: len({value for value in values if value is not None}),
+    "sum": _sum,
+    "mean": _mean,
+    "avg": _mean,
+    "min": lambda values: min((value for value in values if value is not None), default=None),
+    "max": lambda values: max((value for value in values if value is not None), default=None),
+    "median": lambda values: statistics.median(_numbers(values)) if _numbers(values) else None,
+    "std": lambda values: statistics.stdev(_numbers(values)) if len(_numbers(values)) > 1 else None,
+    "var": lambda values: statistics.variance(_numbers(values)) if len(_numbers(values)) > 1 else None,
+    "first": lambda values: values[0] if values else None,
+    "last": lambda values: values[-1] if values else None,
+}
+
+# Aggregates that ignore values which are not numbers; the result reports how many were skipped
+NUMERIC_AGGREGATES = {"sum", "mean", "avg", "median", "std", "var"}
+
+PIPELINE_KEYS = {"table", "filter", "compute", "group_by", "aggregate", "sort", "select", "limit"}
+
+def _is_string_list(value: Any) -> bool:
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+def _validate_pipeline(pipeline: Dict[str, Any]) -> None:
+    """
+    Check the shape of a pipeline before running it
+
+    Raises:
+        AnalysisError: If a key is unknown or a value has the wrong type
+    """
+    if not isinstance(pipeline, dict):
+        raise AnalysisError("The pipeline must be a JSON object")
+    unknown = set(pipeline) - PIPELINE_KEYS
+    if unknown:
+        raise AnalysisError(f"Unknown pipeline keys {', '.join(sorted(unknown))}, allowed: {', '.join(sorted(PIPELINE_KEYS))}")
+    if not isinstance(pipeline.get("table"), str):
+        raise AnalysisError('"table" must be a table name')
+    if pipeline.get("filter") is not None and not isinstance(pipeline["filter"], str):
+        raise AnalysisError('"filter" must be an expression string')
+    for key in ("group_by", "sort", "select"):
+        if pipeline.get(key) is not None and not _is_string_list(pipeline[key]):
+            raise AnalysisError(f'"{key}" must be a list of column names')
+    compute = pipeline.get("compute")
+    if compute is not None and not (isinstance(compute, dict) and all(isinstance(value, str) for value in compute.values())):
+        raise AnalysisError('"compute" must map column names to expression strings')
+    aggregate = pipeline.get("aggregate")
+    if aggregate is not None:
+        if not isinstance(aggregate, dict):
+            raise AnalysisError('"aggregate" must map output names to [function, expression]')
+        for output_name, spec in aggregate.items():
+            if not (isinstance(spec, str) or _is_string_list(spec) and len(spec) == 2):
+                raise AnalysisError(f'Aggregate {output_name!r} must be [function, expression], e.g. ["sum", "Revenue"]')
+    limit = pipeline.get("limit")
+    if limit is not None and (not isinstance(limit, int) or isinstance(limit, bool) or limit < 0):
+        raise AnalysisError('"limit" must be a non-negative integer')
+
+def _sort_key(value: Any):
+    # Numbers before strings so mixed columns don't raise
+    if isinstance(value, (int, float)):
+        return (0, value)
+    return (1, str(value))
+
+def run_pipeline(
+    pipeline: Dict[str, Any],
+    tables: Dict[str, Any],
+    max_result_rows: int = 200,
+    zone_maps: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+) -> Dict[str, Any]:
+    """
+    Run a pipeline against table data
+
+    Args:
+        pipeline: Pipeline specification (see module docstring)
+        tables: Tables in the UploadResponse structure, keyed by table name
+        max_result_rows: Maximum number of result rows returned
+        zone_maps: Optional zone maps keyed by table name, used to skip blocks the filter cannot match
+
+    Returns:
+        Dictionary with columns, rows, rowCount and truncated, plus skippedValues
+        (non-numeric values ignored per numeric aggregate) when any were skipped
+
+    Raises:
+        AnalysisError: If the pipeline is malformed or references unknown tables or functions
+    """
+    _validate_pipeline(pipeline)
+    table_name = pipeline["table"]
+    if table_name not in tables:
+        raise AnalysisError(f"Unknown table {table_name!r}, available tables: {', '.join(tables)}")
+    table = tables[table_name]
+    rows: List[Dict[str, Any]] = table.get("rows", [])
+    columns = list(table.get("headers", []))
+
+    if pipeline.get("filter"):
+        predicate = compile_expression(pipeline["filter"])
+        table_zone_maps = (zone_maps or {}).get(table_name)
+        if table_zone_maps and table_zone_maps[-1]["end"] == len(rows):
+            rows = prune_blocks(rows, pipeline["filter"], table_zone_maps)
+        rows = [row for row in rows if predicate(row)]
+
+    if pipeline.get("compute"):
+        computed = {name: compile_expression(expression) for name, expression in pipeline["compute"].items()}
+        rows = [{**row, **{name: function(row) for name, function in computed.items()}} for row in rows]
+        columns += [name for name in computed if name not in columns]
+
+    group_by = pipeline.get("group_by") or []
+    aggregate = pipeline.get("aggregate") or {}
+    skipped: Dict[str, int] = {}
+    if aggregate:
+        specs = []
+        for output_name, spec in aggregate.items():
+            function_name, argument = (spec, "*") if isinstance(spec, str) else spec
+            if function_name not in AGGREGATES:
+                raise AnalysisError(f"Unknown aggregate {function_name!r}, available: {', '.join(AGGREGATES)}")
+            value_of = (lambda row: 1) if argument == "*" else compile_expression(argument)
+            specs.append((output_name, function_name, value_of))
+
+        groups: Dict[tuple, List[Dict[str, Any]]] = {}
+        for row in rows:
+            groups.setdefault(tuple(row.get(column) for column in group_by), []).append(row)
+        if not group_by and not groups:
+            groups[()] = []
+
+        rows = []
+        for key, group_rows in groups.items():
+            result = dict(zip(group_by, key))
+            for output_name, function_name, value_of in specs:
+                values = [value_of(row) for row in group_rows]
+                result[output_name] = AGGREGATES[function_name](values)
+                if function_name in NUMERIC_AGGREGATES:
+                    skipped[output_name] = skipped.get(output_name, 0) + _skipped(values)
+            rows.append(result)
+        columns = list(group_by) + [output_name for output_name, _, _ in specs]
+
+    for sort_spec in reversed(pipeline.get("sort") or []):
+        descending = sort_spec.startswith("-")
+        column = sort_spec.lstrip("-")
+        # Missing values go last in both directions; both sorts are stable so earlier keys still hold
+        present = [row for row in rows if row.get(column) is not None]
+        missing = [row for row in rows if row.get(column) is None]
+        present.sort(key=lambda row: _sort_key(row.get(column)), reverse=descending)
+        rows = present + missing
+
+    if pipeline.get("select"):
+        columns = list(pipeline["select"])
+
+    row_count = len(rows)
+    limit = max_result_rows if pipeline.get("limit") is None else min(pipeline["limit"], max_result_rows)
+    result = {
+        "columns": columns,
+        "rows": [[row.get(column) for column in columns] for row in rows[:limit]],
+        "rowCount": row_count,
+        "truncated": row_count > limit,
+    }
+    skipped = {output_name: count for output_name, count in skipped.items() if count}
+    if skipped:
+        result["skippedValues"] = skipped
+    return result
+
+def run_sandboxed(
+    pipeline: Dict[str, Any],
+    tables: Dict[str, Any],
+    timeout_seconds: float,
+    memory_limit_mb: int,
+    max_result_rows: int,
+    zone_maps: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+) -> Dict[str, Any]:
+    """
+    Run a pipeline in a separate, resource-limited Python process
+
+    Raises:
+        AnalysisError: If the pipeline is invalid, fails or exceeds a limit
+    """
+    payload = json.dumps({
+        "pipeline": pipeline,
+        "tables": tables,
+        "max_result_rows": max_result_rows,
+        "zone_maps": zone_maps,
+    })
+    command = [sys.executable, "-E", "-m", "app.core.analysis", str(math.ceil(timeout_seconds)), str(memory_limit_mb)]
+    try:
+        completed = subprocess.run(
+            command,
+            input=payload.encode("utf-8"),
+            capture_output=True,
+            cwd=BACKEND_DIR,
+            # Nothing from the server environment (API keys included) reaches the sandbox
+            env={name: os.environ[name] for name in ("SYSTEMROOT",) if name in os.environ},
+            timeout=timeout_seconds,
+        )
+    except subprocess.TimeoutExpired as e:
+        raise AnalysisError(f"Analysis took longer than {timeout_seconds} seconds") from e
+
+    if completed.returncode != 0:
+        error = completed.stderr.decode("utf-8", "replace").strip().splitlines()
+        raise AnalysisError(error[-1] if error else f"Analysis process exited with code {completed.returncode}")
+
+    result = json.loads(completed.stdout)
+    if "error" in result:
+        raise AnalysisError(result["error"])
+    return result
+
+def _limit_resources(cpu_seconds: int, memory_limit_mb: int) -> None:
+    try:
+        import resource
+    except ImportError:  # Not available on Windows; the parent's timeout still applies
+        return
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+    memory_bytes = memory_limit_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+
+def main() -> None:
+    _limit_resources(int(sys.argv[1]), int(sys.argv[2]))
+    request = json.load(sys.stdin)
+    try:
+        result = run_pipeline(request["pipeline"], request["tables"], request["max_result_rows"], request["zone_maps"])
+    except AnalysisError as e:
+        result = {"error": str(e)}
+    except (TypeError, ValueError, KeyError, ArithmeticError, RecursionError) as e:
+        result = {"error": f"{type(e).__name__}: {e}"}
+    json.dump(result, sys.stdout, default=str)
+
+if __name__ == "__main__":
+    main()
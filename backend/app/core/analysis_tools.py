@@ -0,0 +1,73 @@
+import json
+from typing import Any, Dict
+from agno.tools import Toolkit
+from .analysis import AnalysisError, run_sandboxed
+from .config import settings
+from .sketches import summarize_stats
+
+class AnalysisTools(Toolkit):
+    """Runs analysis pipelines over the selected tables in a sandboxed subprocess"""
+
+    def __init__(self, tables: Dict[str, Any], stats: Dict[str, Any] = None, **kwargs):
+        self.tables = tables
+        self.stats = stats or {}
+        super().__init__(name="analysis", tools=[self.column_stats, self.run_analysis], **kwargs)
+
+    def column_stats(self, table: str) -> str:
+        """Get precomputed statistics for every column of a table instantly, without scanning it.
+        Use this first for distinct counts, min/max, mean, percentiles (p5, p25, p50, p75, p95)
+        and the most frequent values. Distinct counts and percentiles are approximate (within a
+        few percent); use run_analysis when an exact figure is required.
+
+        Args:
+            table (str): Name of one of the available tables.
+
+        Returns:
+            str: JSON with rowCount and per-column count, nulls, distinct, min, max, mean,
+                quantiles and topValues ([value, count, maximum overcount]), or an "error" message.
+        """
+        if table not in self.stats:
+            return json.dumps({"error": f"No statistics for table {table!r}, available: {', '.join(self.stats)}"})
+        return json.dumps(summarize_stats(self.stats[table]), default=str)
+
+    def run_analysis(self, pipeline: str) -> str:
+        """Run an exact calculation over a whole table in one call: filtering, derived columns,
+        grouping, aggregation, sorting and limiting. Use this for every calculation on table data
+        instead of doing arithmetic yourself.
+
+        The pipeline is a JSON object with these keys (only "table" is required):
+        - "table": name of one of the available tables
+        - "filter": boolean expression, e.g. "Region == 'North' and Revenue > 100000"
+        - "compute": {"new_column": expression}, e.g. {"order_value": "TotalSpent / TotalOrders"}
+        - "group_by": list of column names
+        - "aggregate": {"output": [function, expression]} with function one of count, count_distinct,
+          sum, mean, min, max, median, std, var, first, last; use "*" as the expression to count rows
+        - "select": list of columns to return when not aggregating
+        - "sort": list of columns, prefix with "-" for descending
+        - "limit": maximum number of rows to return
+
+        Expressions support column names (or col("Name With Spaces")), numbers, strings,
+        + - * / // % **, comparisons, in / not in, and / or / not, x if cond else y and the functions
+        abs, round, min, max, len, lower, upper, str, num, coalesce, contains, startswith, substr.
+
+        Args:
+            pipeline (str): JSON object describing the analysis.
+
+        Returns:
+            str: JSON with "columns", "rows", "rowCount" and "truncated", or an "error" message.
+                If sum, mean, median, std or var ignored values that are not numbers, "skippedValues"
+                gives the count per output; mention it, since the figure then excludes those values.
+        """
+        try:
+            spec = json.loads(pipeline)
+            result = run_sandboxed(
+                spec,
+                self.tables,
+                timeout_seconds=settings.analysis_timeout_seconds,
+                memory_limit_mb=settings.analysis_memory_limit_mb,
+                max_result_rows=settings.analysis_max_result_rows,
+                zone_maps={name: table_stat["zoneMaps"] for name, table_stat in self.stats.items()},
+            )
+        except (AnalysisError, ValueError) as e:
+            return json.dumps({"error": str(e)})
+        return json.dumps(result, default=str)
@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -12,14 +13,51 @@ class Settings(BaseSettings):
     cors_allow_headers: list[str] = ["*"]
     
     # Database settings
+    # Any SQLAlchemy URL works here; use a server database (e.g. postgresql+psycopg://...)
+    # when workers run on more than one host
     database_url: str = "sqlite:///./chat_sessions.db"
+    database_busy_timeout_ms: int = 5000
+    
+    # Table store settings
+    table_cache_size: int = 64
+    files_page_size: int = 50
+    stats_block_size: int = 1024
+    stats_top_values: int = 10
+    
+    # Tables with more rows are described to the model by column statistics and sample rows
+    prompt_full_rows_limit: int = 50
+    
+    # Response encoding for table payloads
+    response_compression_min_bytes: int = 1024
+    response_gzip_level: int = 6
+    response_brotli_quality: int = 4
     
     # OpenAI settings
     openai_model: str = "gpt-4o"
     
+    # Analysis tool sandbox
+    analysis_timeout_seconds: float = 10.0
+    analysis_memory_limit_mb: int = 512
+    analysis_max_result_rows: int = 200
+    
+    # Model call scheduling (account-wide limits, split evenly across workers)
+    model_requests_per_minute: int = 500
+    model_tokens_per_minute: int = 30000
+    model_expected_output_tokens: int = 1000
+    model_max_concurrent_calls: int = 8
+    model_max_queue_size: int = 32
+    model_max_wait_seconds: float = 30.0
+    model_max_retries: int = 3
+    model_retry_base_delay: float = 0.5
+    model_retry_max_delay: float = 8.0
+    # Worker processes sharing the account limits across all hosts; defaults to workers
+    model_rate_limit_shares: Optional[int] = None
+    
     # Server settings
     host: str = "0.0.0.0"
     port: int = 8000
+    # Worker processes started on this host by main.py
+    workers: int = 1
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,52 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import StaticPool
+from .config import settings
+
+def create_db_engine(database_url: str = None) -> Engine:
+    """
+    Create the engine shared by the chat session storage and the table store
+
+    SQLite files are opened in WAL mode with a busy timeout so that several
+    worker processes can read concurrently while one of them writes. Any other
+    SQLAlchemy URL (e.g. PostgreSQL) is used as-is, which is what multi-host
+    deployments need. "sqlite://" gives a private in-memory database for tests.
+
+    Args:
+        database_url: SQLAlchemy URL, defaults to settings.database_url
+
+    Returns:
+        Configured SQLAlchemy engine
+    """
+    database_url = database_url or settings.database_url
+
+    if not database_url.startswith("sqlite"):
+        return create_engine(database_url, pool_pre_ping=True)
+
+    if database_url in ("sqlite://", "sqlite:///:memory:"):
+        # A single shared connection, otherwise every connection sees its own empty database
+        return create_engine(
+            "sqlite://",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+
+    engine = create_engine(
+        database_url,
+        connect_args={
+            "check_same_thread": False,
+            "timeout": settings.database_busy_timeout_ms / 1000,
+        },
+    )
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={settings.database_busy_timeout_ms}")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    return engine
+
+engine = create_db_engine()
@@ -1,9 +1,8 @@
 from agno.agent import Agent
-from agno.models.openai import OpenAIChat
 from agno.tools.calculator import CalculatorTools
 from pydantic import BaseModel
-from ..schemas.upload import TableInfo
 from .config import settings
+from .scheduler import model_scheduler, ModelBusyError, ScheduledOpenAIChat
 import uuid
 from typing import Dict, Any, List
 
@@ -25,29 +24,32 @@ class ExcelProcessingResponse(BaseModel):
     summary: str
     recommendations: List[str]
 
-# Create Excel processing agent
-excel_agent = Agent(
-    name="Excel File Processor",
-    model=OpenAIChat(id=settings.openai_model),
-    tools=[
-        CalculatorTools(
-            add=True,
-            subtract=True,
-            multiply=True,
-            divide=True,
-            exponentiate=True,
-            factorial=True,
-            is_prime=True,
-            square_root=True,
-        )
-    ],
-    show_tool_calls=True,
-    response_model=ExcelProcessingResponse,
-    use_json_mode=True,
-    storage=None,  # No need for session storage for Excel processing
-    add_history_to_messages=False,
-    markdown=True,
-    instructions="""You are an Excel file processing specialist. Your task is to analyze Excel files and extract structured table data.
+def create_excel_agent() -> Agent:
+    """
+    Create an Excel processing agent for a single request (agents are not safe to share between threads)
+    """
+    return Agent(
+        name="Excel File Processor",
+        model=ScheduledOpenAIChat(id=settings.openai_model),
+        tools=[
+            CalculatorTools(
+                add=True,
+                subtract=True,
+                multiply=True,
+                divide=True,
+                exponentiate=True,
+                factorial=True,
+                is_prime=True,
+                square_root=True,
+            )
+        ],
+        show_tool_calls=True,
+        response_model=ExcelProcessingResponse,
+        use_json_mode=True,
+        storage=None,  # No need for session storage for Excel processing
+        add_history_to_messages=False,
+        markdown=True,
+        instructions="""You are an Excel file processing specialist. Your task is to analyze Excel files and extract structured table data.
 
 When processing Excel files:
 1. Identify all sheets/tables in the Excel file
@@ -66,7 +68,7 @@ Response Structure:
 - recommendations: list of suggested analyses or next steps
 
 Always return realistic sample data that matches typical Excel business data (sales, customers, products, etc.) with proper data types and realistic values.""",
-)
+    )
 
 def process_excel_file(filename: str, file_content: str = None) -> Dict[str, Any]:
     """
@@ -101,25 +103,25 @@ def process_excel_file(filename: str, file_content: str = None) -> Dict[str, Any
         Return structured data following the ExcelProcessingResponse model.
         """
         
-        # Process with agent
-        response = excel_agent.run(
-            message=processing_prompt,
-            stream=False
+        # Process with agent; identical uploads in flight share one model call
+        response = model_scheduler.run(
+            lambda: create_excel_agent().run(message=processing_prompt, stream=False),
+            key=model_scheduler.make_key("excel", processing_prompt),
         )
         
         if response.content and hasattr(response.content, 'tables'):
             # Convert agent response to UploadResponse format
+            # (plain dicts: the rows were already validated by ExcelProcessingResponse)
             tables_dict = {}
             for table in response.content.tables:
-                table_info = TableInfo(
-                    title=table.title,
-                    headers=table.headers,
-                    rows=table.rows,
-                    rowCount=table.rowCount,
-                    columnCount=table.columnCount,
-                    dataType=table.dataType
-                )
-                tables_dict[table.tableName] = table_info
+                tables_dict[table.tableName] = {
+                    "title": table.title,
+                    "headers": table.headers,
+                    "rows": table.rows,
+                    "rowCount": table.rowCount,
+                    "columnCount": table.columnCount,
+                    "dataType": table.dataType
+                }
             
             return {
                 "fileId": str(uuid.uuid4()),
@@ -132,6 +134,8 @@ def process_excel_file(filename: str, file_content: str = None) -> Dict[str, Any
             # Fallback to mock data if agent fails
             return get_mock_excel_data(filename)
             
+    except ModelBusyError:
+        raise
     except Exception as e:
         print(f"Error processing Excel file: {e}")
         # Fallback to mock data
@@ -0,0 +1,364 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Type, TypeVar, Union
+import openai
+from agno.models.message import Message
+from agno.models.openai import OpenAIChat
+from pydantic import BaseModel
+from .config import settings
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+class ModelBusyError(Exception):
+    """Raised when a model call is rejected to protect the provider rate limit or the queue"""
+
+    def __init__(self, message: str, status_code: int, retry_after: float):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously up to its capacity
+
+    Reservations may take the balance below zero; the deficit is the time the
+    caller has to wait before its call is within the limit.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        self._refill()
+        deficit = min(amount, self.capacity) - self.tokens
+        return max(0.0, deficit / self.refill_per_second)
+
+    def consume(self, amount: float) -> None:
+        """Take tokens from the bucket; a negative amount gives them back"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - min(amount, self.capacity))
+
+class _InFlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+class ModelCallScheduler:
+    """
+    Admission control for model calls
+
+    - Single-flight: identical agent runs in flight share one run
+    - A bounded queue in front of a fixed number of concurrent runs; callers
+      beyond it are rejected with ModelBusyError
+    - Token buckets for requests and tokens per minute, charged for every
+      provider request (an agent run makes one per round of tool calls) and
+      corrected with the usage the provider reports
+    - Retries of the failed provider request with jittered exponential backoff
+      on rate limits and server errors
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        max_concurrent_calls: int,
+        max_queue_size: int,
+        max_wait_seconds: float,
+        max_retries: int,
+        retry_base_delay: float,
+        retry_max_delay: float,
+    ):
+        self.request_bucket = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self.token_bucket = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+        self.max_concurrent_calls = max_concurrent_calls
+        self.max_queue_size = max_queue_size
+        self.max_wait_seconds = max_wait_seconds
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrent_calls)
+        self._in_flight: Dict[str, _InFlightCall] = {}
+        self._queued = 0
+        self._running = 0
+        self._counters = {
+            "runs_total": 0,
+            "calls_total": 0,
+            "coalesced_total": 0,
+            "rejected_total": 0,
+            "retries_total": 0,
+            "failures_total": 0,
+            "tokens_estimated_total": 0,
+            "tokens_used_total": 0,
+        }
+
+    @staticmethod
+    def make_key(*parts: Optional[str]) -> str:
+        """Build a coalescing key from the prompt and whatever else makes the call unique"""
+        return hashlib.sha256("\x00".join(part or "" for part in parts).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def estimate_tokens(prompt: str) -> int:
+        """Rough prompt size (about 4 characters per token) plus the expected completion"""
+        return len(prompt) // 4 + settings.model_expected_output_tokens
+
+    def run(self, call: Callable[[], T], key: Optional[str] = None) -> T:
+        """
+        Run an agent run in a free slot
+
+        The provider requests the run makes are rate limited one by one through
+        call_model (see ScheduledOpenAIChat).
+
+        Args:
+            call: Function performing the agent run
+            key: Coalescing key; identical keys in flight share one run. None disables coalescing
+
+        Returns:
+            Whatever the call returns
+
+        Raises:
+            ModelBusyError: If the queue is full or no slot frees up within max_wait_seconds
+        """
+        in_flight = None
+        if key is not None:
+            with self._lock:
+                leader = key not in self._in_flight
+                if leader:
+                    in_flight = self._in_flight[key] = _InFlightCall()
+                else:
+                    in_flight = self._in_flight[key]
+                    self._counters["coalesced_total"] += 1
+            if not leader:
+                # Share the result of the identical call that is already running
+                in_flight.done.wait()
+                if in_flight.error is not None:
+                    raise in_flight.error
+                return in_flight.result
+
+        try:
+            result = self._run_scheduled(call)
+        except BaseException as e:
+            if in_flight is not None:
+                in_flight.error = e
+            raise
+        else:
+            if in_flight is not None:
+                in_flight.result = result
+            return result
+        finally:
+            if in_flight is not None:
+                with self._lock:
+                    del self._in_flight[key]
+                in_flight.done.set()
+
+    def _run_scheduled(self, call: Callable[[], T]) -> T:
+        with self._lock:
+            if self._queued >= self.max_queue_size:
+                self._counters["rejected_total"] += 1
+                raise ModelBusyError(
+                    "Too many analysis requests are waiting, please try again shortly",
+                    status_code=503,
+                    retry_after=self.retry_max_delay,
+                )
+            self._queued += 1
+
+        try:
+            acquired = self._slots.acquire(timeout=self.max_wait_seconds)
+            if not acquired:
+                with self._lock:
+                    self._counters["rejected_total"] += 1
+                raise ModelBusyError(
+                    "Timed out waiting for a free model slot, please try again shortly",
+                    status_code=503,
+                    retry_after=self.retry_max_delay,
+                )
+        finally:
+            with self._lock:
+                self._queued -= 1
+
+        with self._lock:
+            self._running += 1
+            self._counters["runs_total"] += 1
+        try:
+            return call()
+        finally:
+            with self._lock:
+                self._running -= 1
+            self._slots.release()
+
+    def call_model(self, call: Callable[[], T], estimated_tokens: int) -> T:
+        """
+        Make a single provider request under the rate limit, retrying only that request
+
+        Args:
+            call: Function performing one provider request
+            estimated_tokens: Tokens charged against the tokens-per-minute budget up front
+
+        Raises:
+            ModelBusyError: If the rate limit cannot be met within max_wait_seconds
+                or the provider is still rate limiting after the retries
+        """
+        self._admit(estimated_tokens)
+        return self._call_with_retries(call, estimated_tokens)
+
+    def record_usage(self, estimated_tokens: int, used_tokens: Optional[int]) -> None:
+        """
+        Correct the tokens-per-minute budget with the usage the provider reported
+
+        Tokens beyond the estimate are charged on top, so later calls wait
+        longer; an overestimate is given back.
+        """
+        with self._lock:
+            self._counters["tokens_estimated_total"] += estimated_tokens
+            if used_tokens is None:
+                return
+            self._counters["tokens_used_total"] += used_tokens
+            self.token_bucket.consume(used_tokens - estimated_tokens)
+
+    def _admit(self, estimated_tokens: int) -> None:
+        """Charge the buckets, sleeping until the call is within the limit"""
+        with self._lock:
+            wait = max(self.request_bucket.wait_time(1), self.token_bucket.wait_time(estimated_tokens))
+            if wait > self.max_wait_seconds:
+                self._counters["rejected_total"] += 1
+                raise ModelBusyError(
+                    "The model rate limit has been reached, please try again shortly",
+                    status_code=429,
+                    retry_after=wait,
+                )
+            self.request_bucket.consume(1)
+            self.token_bucket.consume(estimated_tokens)
+            self._counters["calls_total"] += 1
+        if wait > 0:
+            time.sleep(wait)
+
+    def _call_with_retries(self, call: Callable[[], T], estimated_tokens: int) -> T:
+        attempt = 0
+        while True:
+            try:
+                return call()
+            except Exception as e:
+                if attempt >= self.max_retries or not self._is_retryable(e):
+                    with self._lock:
+                        self._counters["failures_total"] += 1
+                    if self._status_code(e) == 429:
+                        raise ModelBusyError(
+                            "The model provider is rate limiting requests, please try again shortly",
+                            status_code=429,
+                            retry_after=self.retry_max_delay,
+                        ) from e
+                    raise
+                # Full jitter keeps retries from several workers from lining up again
+                delay = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+                attempt += 1
+                with self._lock:
+                    self._counters["retries_total"] += 1
+                time.sleep(delay)
+                self._admit(estimated_tokens)
+
+    @staticmethod
+    def _provider_error(error: BaseException) -> Optional[BaseException]:
+        """
+        Find the OpenAI error behind an exception
+
+        agno wraps provider failures in ModelProviderError, whose status code
+        defaults to 502 even for connection or configuration problems, so only
+        the original OpenAI exception in the __cause__ chain is trusted.
+        """
+        seen = set()
+        while error is not None and id(error) not in seen:
+            if isinstance(error, (openai.APIStatusError, openai.APIConnectionError)):
+                return error
+            seen.add(id(error))
+            error = error.__cause__ or error.__context__
+        return None
+
+    def _status_code(self, error: BaseException) -> Optional[int]:
+        provider_error = self._provider_error(error)
+        if isinstance(provider_error, openai.APIStatusError):
+            return provider_error.status_code
+        return None
+
+    def _is_retryable(self, error: BaseException) -> bool:
+        provider_error = self._provider_error(error)
+        if isinstance(provider_error, openai.APIStatusError):
+            return provider_error.status_code in RETRYABLE_STATUS_CODES
+        # Connection errors and timeouts (APITimeoutError is a subclass)
+        return isinstance(provider_error, openai.APIConnectionError)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Current queue depth and call counters"""
+        with self._lock:
+            return {
+                "queue_depth": self._queued,
+                "running": self._running,
+                "in_flight_keys": len(self._in_flight),
+                **self._counters,
+            }
+
+# Provider limits are per account, so each worker process (on any host) gets its share
+_rate_limit_shares = settings.model_rate_limit_shares or settings.workers
+
+model_scheduler = ModelCallScheduler(
+    requests_per_minute=settings.model_requests_per_minute / _rate_limit_shares,
+    tokens_per_minute=settings.model_tokens_per_minute / _rate_limit_shares,
+    max_concurrent_calls=settings.model_max_concurrent_calls,
+    max_queue_size=settings.model_max_queue_size,
+    max_wait_seconds=settings.model_max_wait_seconds,
+    max_retries=settings.model_max_retries,
+    retry_base_delay=settings.model_retry_base_delay,
+    retry_max_delay=settings.model_retry_max_delay,
+)
+
+def _prompt_text(messages: List[Message], tools: Optional[List[Dict[str, Any]]]) -> str:
+    # Everything resent with each request: the conversation so far, tool calls and results, and the tool schemas
+    parts = [message.get_content_string() + json.dumps(message.tool_calls or [], default=str) for message in messages]
+    return "".join(parts) + json.dumps(tools or [], default=str)
+
+@dataclass
+class ScheduledOpenAIChat(OpenAIChat):
+    """
+    OpenAIChat whose provider requests go through the model scheduler
+
+    agno calls invoke once for the first answer and again after every round of
+    tool calls, each time resending the whole conversation, so each of these
+    requests is charged and retried on its own. The OpenAI client's built-in
+    retries are disabled so that every request the provider sees is counted.
+    Only non-streaming requests are scheduled; the app never streams.
+    """
+
+    max_retries: Optional[int] = 0
+
+    def invoke(
+        self,
+        messages: List[Message],
+        response_format: Optional[Union[Dict, Type[BaseModel]]] = None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        tool_choice: Optional[Union[str, Dict[str, Any]]] = None,
+    ) -> Any:
+        estimated_tokens = model_scheduler.estimate_tokens(_prompt_text(messages, tools))
+        response = model_scheduler.call_model(
+            lambda: super(ScheduledOpenAIChat, self).invoke(
+                messages=messages, response_format=response_format, tools=tools, tool_choice=tool_choice
+            ),
+            estimated_tokens,
+        )
+        usage = getattr(response, "usage", None)
+        model_scheduler.record_usage(estimated_tokens, getattr(usage, "total_tokens", None))
+        return response
@@ -0,0 +1,237 @@
+"""
+Per-column summaries computed once when a file is uploaded
+
+- HyperLogLog for distinct counts
+- KLL sketch for quantiles
+- Space-Saving for the most frequent values
+- Zone maps (min/max/null count per block of rows) for pruning filtered scans
+
+Only the resulting summaries and zone maps are kept; they serialize to plain
+JSON so they can be stored next to the table and shipped to the analysis
+sandbox. Like app.core.analysis, this module only uses the standard library.
+"""
+import hashlib
+import math
+import random
+from typing import Any, Dict, List, Optional
+
+def _hash64(value: Any) -> int:
+    # Stable across processes, unlike hash()
+    return int.from_bytes(hashlib.blake2b(repr(value).encode("utf-8"), digest_size=8).digest(), "big")
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and not (
+        isinstance(value, float) and math.isnan(value)
+    )
+
+class HyperLogLog:
+    """Distinct count estimate with about 1.04 / sqrt(2 ** precision) relative error"""
+
+    def __init__(self, precision: int = 12):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+
+    def add(self, value: Any) -> None:
+        hashed = _hash64(value)
+        index = hashed >> (64 - self.precision)
+        remaining = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size ** 2 / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.size and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = self.size * math.log(self.size / zeros)
+        return int(round(estimate))
+
+class KLLSketch:
+    """Quantile sketch keeping O(k) items with rank error around 1.7 / k"""
+
+    def __init__(self, k: int = 200, seed: int = 0):
+        self.k = k
+        self.count = 0
+        self.compactors: List[List[float]] = [[]]
+        self._random = random.Random(seed)
+        self._size = 0
+        self._max_size = self._capacity(0)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def add(self, value: float) -> None:
+        self.compactors[0].append(value)
+        self.count += 1
+        self._size += 1
+        if self._size >= self._max_size:
+            self._compress()
+            self._size = sum(len(compactor) for compactor in self.compactors)
+            self._max_size = sum(self._capacity(level) for level in range(len(self.compactors)))
+
+    def _compress(self) -> None:
+        for level, compactor in enumerate(self.compactors):
+            if len(compactor) >= self._capacity(level):
+                if level + 1 == len(self.compactors):
+                    self.compactors.append([])
+                compactor.sort()
+                # Keep every other item (at a random offset) with double weight one level up
+                self.compactors[level + 1].extend(compactor[self._random.randint(0, 1)::2])
+                compactor.clear()
+                return
+
+    def quantiles(self, fractions: List[float]) -> List[Optional[float]]:
+        weighted = sorted(
+            (value, 1 << level) for level, compactor in enumerate(self.compactors) for value in compactor
+        )
+        total = sum(weight for _, weight in weighted)
+        results = []
+        for fraction in fractions:
+            if not weighted:
+                results.append(None)
+                continue
+            target, cumulative = fraction * total, 0
+            for value, weight in weighted:
+                cumulative += weight
+                if cumulative >= target:
+                    results.append(value)
+                    break
+            else:
+                results.append(weighted[-1][0])
+        return results
+
+class TopK:
+    """
+    Space-Saving frequent values
+
+    Counts are upper bounds that overestimate by at most the reported error.
+    Instead of evicting the minimum on every new value, the counters are
+    allowed to grow to twice the capacity and then pruned in one pass.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.capacity = capacity
+        self.counters: Dict[Any, List[int]] = {}
+        self.floor = 0
+
+    def add(self, value: Any) -> None:
+        counter = self.counters.get(value)
+        if counter is not None:
+            counter[0] += 1
+            return
+        self.counters[value] = [self.floor + 1, self.floor]
+        if len(self.counters) > 2 * self.capacity:
+            ranked = sorted(self.counters.items(), key=lambda item: item[1][0], reverse=True)
+            self.floor = max(self.floor, ranked[self.capacity][1][0])
+            self.counters = dict(ranked[:self.capacity])
+
+    def top(self, limit: int) -> List[List[Any]]:
+        """Most frequent values as [value, count, error], skipping values not seen at least twice for sure"""
+        ranked = sorted(self.counters.items(), key=lambda item: item[1][0], reverse=True)
+        return [[value, count, error] for value, (count, error) in ranked if count - error > 1][:limit]
+
+QUANTILE_FRACTIONS = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+def _zone(values: List[Any]) -> Dict[str, Any]:
+    # "" is a real string value for filters ("Name == ''"), so only None counts as missing here
+    present = [value for value in values if value is not None]
+    zone: Dict[str, Any] = {"nulls": len(values) - len(present)}
+    if present and all(_is_number(value) for value in present):
+        zone["min"], zone["max"] = min(present), max(present)
+    elif present and all(isinstance(value, str) for value in present):
+        zone["min"], zone["max"] = min(present), max(present)
+    return zone
+
+def build_table_stats(table: Dict[str, Any], block_size: int = 1024, top_k: int = 10) -> Dict[str, Any]:
+    """
+    Compute column summaries (from sketches) and zone maps for one table
+
+    Args:
+        table: Table in the TableInfo structure (headers, rows, dataType)
+        block_size: Rows per zone map block
+        top_k: Number of frequent values reported per column
+
+    Returns:
+        JSON-serializable dictionary with columns, zoneMaps and blockSize
+    """
+    headers = table.get("headers", [])
+    rows = table.get("rows", [])
+    data_types = table.get("dataType", {})
+
+    columns = {}
+    for header in headers:
+        hll, kll, frequent = HyperLogLog(), KLLSketch(), TopK(capacity=max(64, top_k * 4))
+        values = [row.get(header) for row in rows]
+        non_null, total = 0, 0.0
+        numeric = True
+        for value in values:
+            if value is None or value == "":
+                continue
+            non_null += 1
+            hll.add(value)
+            frequent.add(value)
+            if _is_number(value):
+                kll.add(value)
+                total += value
+            else:
+                numeric = False
+        bounds = _zone([value for value in values if value != ""])
+
+        column: Dict[str, Any] = {
+            "type": data_types.get(header, "number" if numeric and non_null else "string"),
+            "count": non_null,
+            "nulls": len(rows) - non_null,
+            "distinct": min(hll.count(), non_null),
+            "min": bounds.get("min"),
+            "max": bounds.get("max"),
+            "topValues": frequent.top(top_k),
+        }
+        if numeric and kll.count:
+            column["mean"] = total / kll.count
+            column["quantiles"] = dict(zip(
+                [f"p{round(fraction * 100)}" for fraction in QUANTILE_FRACTIONS],
+                kll.quantiles(QUANTILE_FRACTIONS),
+            ))
+        columns[header] = column
+
+    zone_maps = []
+    for start in range(0, len(rows), block_size):
+        block = rows[start:start + block_size]
+        zone_maps.append({
+            "start": start,
+            "end": start + len(block),
+            "columns": {header: _zone([row.get(header) for row in block]) for header in headers},
+        })
+
+    return {"rowCount": len(rows), "blockSize": block_size, "columns": columns, "zoneMaps": zone_maps}
+
+def summarize_stats(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Column summaries without the zone maps, for API responses and prompts"""
+    return {"rowCount": stats["rowCount"], "columns": stats["columns"]}
+
+def block_may_match(zone: Dict[str, Any], op: str, value: Any) -> bool:
+    """
+    Whether any row in a zone map block can satisfy `column <op> value`
+
+    Only answers False when the block's min/max prove that no row matches.
+    """
+    if "min" not in zone or value is None:
+        return True
+    low, high = zone["min"], zone["max"]
+    if _is_number(low) != _is_number(value) or (not _is_number(value) and not isinstance(value, str)):
+        return True
+    if op == "==":
+        return low <= value <= high
+    if op == "<":
+        return low < value
+    if op == "<=":
+        return low <= value
+    if op == ">":
+        return high > value
+    if op == ">=":
+        return high >= value
+    return True
@@ -0,0 +1,229 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+import orjson
+from pydantic import BaseModel
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, Text, select, update, insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from .config import settings
+from .database import engine
+
+metadata = MetaData()
+
+uploaded_files = Table(
+    "uploaded_files",
+    metadata,
+    Column("id", String(64), primary_key=True),
+    Column("filename", String(255), nullable=False),
+    Column("original_name", String(255), nullable=False),
+    Column("uploaded_at", String(64), nullable=False),
+    Column("tables", Text, nullable=False),
+    # Server time of the upload; uploaded_at is whatever the processing step reported
+    Column("created_at", DateTime(timezone=True), nullable=False, index=True),
+)
+
+# Column statistics and zone maps per table, computed at upload (see app.core.sketches)
+table_stats = Table(
+    "table_stats",
+    metadata,
+    Column("file_id", String(64), primary_key=True),
+    Column("table_name", String(255), primary_key=True),
+    Column("stats", Text, nullable=False),
+)
+
+# One row per cache; every write bumps the generation so other workers know to drop their copy
+cache_state = Table(
+    "cache_state",
+    metadata,
+    Column("name", String(64), primary_key=True),
+    Column("generation", Integer, nullable=False),
+)
+
+TABLES_CACHE = "tables"
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+class TableStore:
+    """
+    Uploaded files and their tables, shared by all workers through the database
+
+    Each process keeps a small LRU cache of decoded files. The cache is tagged
+    with the generation counter from the cache_state table and is cleared as
+    soon as another worker (or host) has written a newer generation.
+    """
+
+    def __init__(self, db_engine: Engine, cache_size: int = 64):
+        self.engine = db_engine
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._stats_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._generation: Optional[int] = None
+        self._lock = threading.Lock()
+        self._create_tables()
+
+    def _create_tables(self) -> None:
+        try:
+            metadata.create_all(self.engine)
+        except SQLAlchemyError:
+            # Another worker created the tables between the existence check and CREATE TABLE
+            metadata.create_all(self.engine)
+
+        # Seed the generation row up front so writers only ever UPDATE it
+        try:
+            with self.engine.begin() as connection:
+                seeded = connection.execute(
+                    select(cache_state.c.name).where(cache_state.c.name == TABLES_CACHE)
+                ).first()
+                if seeded is None:
+                    connection.execute(insert(cache_state).values(name=TABLES_CACHE, generation=0))
+        except IntegrityError:
+            # Another worker seeded it first
+            pass
+
+    def _bump_generation(self, connection) -> None:
+        connection.execute(
+            update(cache_state)
+            .where(cache_state.c.name == TABLES_CACHE)
+            .values(generation=cache_state.c.generation + 1)
+        )
+
+    def _sync_cache(self, connection) -> None:
+        """Drop the local cache if another worker has written since it was filled"""
+        generation = connection.execute(
+            select(cache_state.c.generation).where(cache_state.c.name == TABLES_CACHE)
+        ).scalar() or 0
+        with self._lock:
+            if generation != self._generation:
+                self._clear_cache()
+                self._generation = generation
+
+    def _clear_cache(self) -> None:
+        self._cache.clear()
+        self._stats_cache.clear()
+
+    def _cache_get(self, cache: OrderedDict, file_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if file_id in cache:
+                cache.move_to_end(file_id)
+                return cache[file_id]
+        return None
+
+    def _cache_put(self, cache: OrderedDict, file_id: str, record: Dict[str, Any]) -> None:
+        with self._lock:
+            cache[file_id] = record
+            cache.move_to_end(file_id)
+            while len(cache) > self.cache_size:
+                cache.popitem(last=False)
+
+    @staticmethod
+    def _to_record(row) -> Dict[str, Any]:
+        return {
+            "id": row.id,
+            "filename": row.filename,
+            "originalName": row.original_name,
+            "uploadedAt": row.uploaded_at,
+            "tables": orjson.loads(row.tables),
+        }
+
+    def save_file(self, file_data: Dict[str, Any], stats: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+        """
+        Store an uploaded file in the UploadResponse structure
+
+        Args:
+            file_data: Dictionary with fileId, filename, originalName, uploadedAt and tables
+            stats: Optional column statistics keyed by table name
+        """
+        with self.engine.begin() as connection:
+            connection.execute(
+                insert(uploaded_files).values(
+                    id=file_data["fileId"],
+                    filename=file_data["filename"],
+                    original_name=file_data["originalName"],
+                    uploaded_at=file_data["uploadedAt"],
+                    tables=orjson.dumps(file_data["tables"], default=_encode).decode("utf-8"),
+                    created_at=datetime.now(timezone.utc),
+                )
+            )
+            if stats:
+                connection.execute(insert(table_stats), [
+                    {"file_id": file_data["fileId"], "table_name": table_name, "stats": orjson.dumps(table_stat).decode("utf-8")}
+                    for table_name, table_stat in stats.items()
+                ])
+            self._bump_generation(connection)
+        with self._lock:
+            self._clear_cache()
+            self._generation = None
+
+    def get_file(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a stored file by id
+
+        Returns:
+            File information dictionary, or None if the file is unknown
+        """
+        with self.engine.connect() as connection:
+            self._sync_cache(connection)
+            record = self._cache_get(self._cache, file_id)
+            if record is not None:
+                return record
+            row = connection.execute(
+                select(uploaded_files).where(uploaded_files.c.id == file_id)
+            ).first()
+        if row is None:
+            return None
+        record = self._to_record(row)
+        self._cache_put(self._cache, file_id, record)
+        return record
+
+    def get_table_stats(self, file_id: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the column statistics stored for a file
+
+        Returns:
+            Statistics keyed by table name; empty if the file or its statistics are unknown
+        """
+        with self.engine.connect() as connection:
+            self._sync_cache(connection)
+            stats = self._cache_get(self._stats_cache, file_id)
+            if stats is not None:
+                return stats
+            rows = connection.execute(
+                select(table_stats.c.table_name, table_stats.c.stats).where(table_stats.c.file_id == file_id)
+            ).all()
+        stats = {row.table_name: orjson.loads(row.stats) for row in rows}
+        self._cache_put(self._stats_cache, file_id, stats)
+        return stats
+
+    def list_files(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        List stored files in upload order, a page at a time
+
+        Files already in the local cache are not decoded again.
+
+        Args:
+            limit: Maximum number of files returned
+            offset: Number of files to skip
+        """
+        with self.engine.connect() as connection:
+            self._sync_cache(connection)
+            file_ids = connection.execute(
+                select(uploaded_files.c.id)
+                .order_by(uploaded_files.c.created_at, uploaded_files.c.id)
+                .limit(limit)
+                .offset(offset)
+            ).scalars().all()
+            records = {file_id: self._cache_get(self._cache, file_id) for file_id in file_ids}
+            missing = [file_id for file_id, record in records.items() if record is None]
+            if missing:
+                rows = connection.execute(select(uploaded_files).where(uploaded_files.c.id.in_(missing))).all()
+                for row in rows:
+                    records[row.id] = self._to_record(row)
+                    self._cache_put(self._cache, row.id, records[row.id])
+        return [records[file_id] for file_id in file_ids if records[file_id] is not None]
+
+table_store = TableStore(engine, cache_size=settings.table_cache_size)
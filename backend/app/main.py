@@ -1,7 +1,10 @@
-from fastapi import FastAPI
+import math
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from .routers import chat, files
 from .core.config import settings
+from .core.scheduler import model_scheduler, ModelBusyError
 
 app = FastAPI(title=settings.app_name, version=settings.app_version)
 
@@ -14,6 +17,14 @@ app.add_middleware(
     allow_headers=settings.cors_allow_headers,
 )
 
+@app.exception_handler(ModelBusyError)
+async def model_busy_handler(request: Request, exc: ModelBusyError):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
+
 # Include routers
 app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
 app.include_router(files.router, prefix="/api", tags=["files"])
@@ -24,4 +35,8 @@ async def root():
 
 @app.get("/api/health")
 async def health_check():
-    return {"status": "healthy", "service": "excel-processor"}
\ No newline at end of file
+    return {"status": "healthy", "service": "excel-processor"}
+
+@app.get("/api/metrics")
+async def metrics():
+    return {"modelScheduler": model_scheduler.metrics()}
\ No newline at end of file
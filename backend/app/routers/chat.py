@@ -5,7 +5,7 @@ from ..services.chat_service import create_chat_session, process_chat_message, c
 router = APIRouter()
 
 @router.post("/sessions")
-async def create_chat_session_endpoint(request: Dict[str, Any]):
+def create_chat_session_endpoint(request: Dict[str, Any]):
     """
     Create a new chat session - Agno handles sessions automatically
     """
@@ -15,14 +15,15 @@ async def create_chat_session_endpoint(request: Dict[str, Any]):
     return create_chat_session(file_id, selected_tables)
 
 @router.post("/sessions/{session_id}/messages")
-async def send_chat_message_endpoint(session_id: str, request: Dict[str, Any]):
+def send_chat_message_endpoint(session_id: str, request: Dict[str, Any]):
     """
     Process a chat message and return AI response using Agno agent
     """
     message = request.get("message", "")
     selected_tables = request.get("selectedTables", {})
+    file_id = request.get("fileId", "")
     
-    return process_chat_message(session_id, message, selected_tables)
+    return process_chat_message(session_id, message, selected_tables, file_id)
 
 @router.delete("/sessions/{session_id}")
 async def clear_chat_session_endpoint(session_id: str):
@@ -1,22 +1,38 @@
-from fastapi import APIRouter, UploadFile, File
-from ..services.upload_service import upload_and_process_excel, get_available_files
+from fastapi import APIRouter, UploadFile, File, Request, HTTPException, Query
+from ..services.upload_service import upload_and_process_excel, get_available_files, get_file_stats
+from ..utils.responses import table_response
 
 router = APIRouter()
 
 @router.post("/upload/excel")
-async def upload_excel(file: UploadFile = File(...)):
+def upload_excel(request: Request, file: UploadFile = File(...)):
     """
     Excel upload endpoint that processes the uploaded file using AI agent
     to extract and analyze table data
+    
+    Pass ?format=columnar to receive each table as per-column value lists
     """
     # Process the Excel file using the AI agent
     result = upload_and_process_excel(file.filename or "uploaded_file.xlsx")
     
-    return result
+    return table_response(request, result)
 
 @router.get("/files")
-async def get_files():
+def get_files(request: Request, limit: int = Query(None, ge=1, le=500), offset: int = Query(0, ge=0)):
     """
     Endpoint to return available files (for compatibility with existing frontend)
+    
+    Pass ?limit=&offset= to page through the files and ?format=columnar to
+    receive each table as per-column value lists
+    """
+    return table_response(request, get_available_files(limit, offset))
+
+@router.get("/files/{file_id}/stats")
+def get_file_stats_endpoint(file_id: str):
+    """
+    Column statistics computed at upload: distinct counts, quantiles, top values, min/max
     """
-    return get_available_files()
\ No newline at end of file
+    stats = get_file_stats(file_id)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="No statistics for this file")
+    return stats
\ No newline at end of file
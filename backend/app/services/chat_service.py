@@ -1,13 +1,35 @@
 import uuid
 from typing import Dict, Any
-from ..core.agent import agent
-from ..utils.prompt_builder import create_enhanced_prompt
+from ..core.agent import create_agent
+from ..core.config import settings
+from ..core.scheduler import model_scheduler, ModelBusyError
+from ..core.sketches import build_table_stats
+from ..core.table_store import table_store
+from ..utils.prompt_builder import create_enhanced_prompt, format_column_stats
 from ..schemas.chat import StructuredAgentResponse
 
-def process_chat_message(session_id: str, message: str, selected_tables: Dict[str, Any]) -> Dict[str, Any]:
+PROMPT_SAMPLE_ROWS = 5
+
+def process_chat_message(session_id: str, message: str, selected_tables: Dict[str, Any], file_id: str = "") -> Dict[str, Any]:
     """
     Process a chat message and return AI response using Agno agent
     """
+    # Use the stored rows for uploaded tables, so the analysis tools scan exactly the rows
+    # the stored statistics and zone maps were built from
+    stored_file = table_store.get_file(file_id) if file_id else None
+    stored_tables = stored_file["tables"] if stored_file else {}
+    stored_stats = table_store.get_table_stats(file_id) if stored_file else {}
+    tables, table_stats = {}, {}
+    for table_name, table_info in selected_tables.items():
+        if table_name in stored_tables and table_name in stored_stats:
+            tables[table_name] = stored_tables[table_name]
+            table_stats[table_name] = stored_stats[table_name]
+        else:
+            # Unknown file or no fileId sent: summarize the rows the client sent
+            tables[table_name] = table_info
+            table_stats[table_name] = build_table_stats(table_info, settings.stats_block_size, settings.stats_top_values)
+    selected_tables = tables
+    
     # Create context about selected tables for the agent
     table_context = ""
     if selected_tables:
@@ -17,16 +39,22 @@ def process_chat_message(session_id: str, message: str, selected_tables: Dict[st
             table_context += f"  Columns: {', '.join(table_info.get('headers', []))}\n"
             table_context += f"  Rows: {table_info.get('rowCount', 0)}\n"
             
-            # Include complete table data for analysis
             rows = table_info.get('rows', [])
-            if rows:
+            if len(rows) > settings.prompt_full_rows_limit:
+                # Large tables: describe the columns and show a few rows; the tools work on the full data
+                table_context += "  Column statistics (approximate distinct counts and percentiles):\n"
+                table_context += format_column_stats(table_stats[table_name], indent="    ")
+                rows = rows[:PROMPT_SAMPLE_ROWS]
+                table_context += f"  First {len(rows)} rows (use the analysis tools for the rest):\n"
+            elif rows:
+                # Include complete table data for analysis
                 table_context += "  Complete table data:\n"
-                for i, row in enumerate(rows):
-                    table_context += f"    Row {i+1}: "
-                    row_data = []
-                    for header in table_info.get('headers', []):
-                        row_data.append(f"{header}: {row.get(header, 'N/A')}")
-                    table_context += " | ".join(row_data) + "\n"
+            for i, row in enumerate(rows):
+                table_context += f"    Row {i+1}: "
+                row_data = []
+                for header in table_info.get('headers', []):
+                    row_data.append(f"{header}: {row.get(header, 'N/A')}")
+                table_context += " | ".join(row_data) + "\n"
             table_context += "\n"
     
     # Create enhanced prompt for structured output
@@ -36,10 +64,10 @@ def process_chat_message(session_id: str, message: str, selected_tables: Dict[st
     
     # Use Agno agent to generate structured response
     try:
-        response = agent.run(
-            message=enhanced_prompt,
-            session_id=session_id,
-            stream=False
+        # Identical messages in flight for the same session (e.g. a double submit) share one model call
+        response = model_scheduler.run(
+            lambda: create_agent(selected_tables, table_stats).run(message=enhanced_prompt, session_id=session_id, stream=False),
+            key=model_scheduler.make_key("chat", session_id, enhanced_prompt),
         )
         
         # Process the RunResponse from the agent
@@ -180,6 +208,9 @@ def process_chat_message(session_id: str, message: str, selected_tables: Dict[st
             }
         }
     
+    except ModelBusyError:
+        # Surface as 429/503 with Retry-After instead of an error message in the chat
+        raise
     except Exception as e:
         # Fallback response if Agno fails
         error_message = f"I apologize, but I encountered an error processing your request: {str(e)}"
@@ -216,13 +247,12 @@ def create_chat_session(file_id: str = "", selected_tables: list = None) -> Dict
     
     # Initialize the session with Agno by sending a welcome message
     try:
-        welcome_response = agent.run(
-            message="Hello! I'm your Excel analysis assistant. I'm ready to help you analyze your data.",
-            session_id=session_id,
-            stream=False
+        welcome_message = "Hello! I'm your Excel analysis assistant. I'm ready to help you analyze your data."
+        welcome_response = model_scheduler.run(
+            lambda: create_agent().run(message=welcome_message, session_id=session_id, stream=False),
         )
     except Exception:
-        # If Agno fails, continue without initializing the session
+        # If Agno fails or the model is busy, continue without initializing the session
         pass
     
     return {
@@ -1,5 +1,8 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from ..core.excel_agent import process_excel_file
+from ..core.config import settings
+from ..core.sketches import build_table_stats, summarize_stats
+from ..core.table_store import table_store
 
 def upload_and_process_excel(filename: str) -> Dict[str, Any]:
     """
@@ -11,15 +14,44 @@ def upload_and_process_excel(filename: str) -> Dict[str, Any]:
     Returns:
         Dictionary matching the UploadResponse structure
     """
-    return process_excel_file(filename)
+    result = process_excel_file(filename)
+    stats = {
+        table_name: build_table_stats(table, settings.stats_block_size, settings.stats_top_values)
+        for table_name, table in result["tables"].items()
+    }
+    table_store.save_file(result, stats)
+    return result
 
-def get_available_files() -> list[Dict[str, Any]]:
+def get_file_stats(file_id: str) -> Optional[Dict[str, Any]]:
     """
-    Get list of available files (mock implementation)
+    Get the column statistics computed at upload for each table of a file
+    
+    Args:
+        file_id: Id of the uploaded file
+    
+    Returns:
+        Column summaries keyed by table name, or None if the file has no statistics
+    """
+    stats = table_store.get_table_stats(file_id)
+    if not stats:
+        return None
+    return {table_name: summarize_stats(table_stat) for table_name, table_stat in stats.items()}
+
+def get_available_files(limit: int = None, offset: int = 0) -> list[Dict[str, Any]]:
+    """
+    Get list of available files from the shared table store
+    
+    Args:
+        limit: Maximum number of files, defaults to settings.files_page_size
+        offset: Number of files to skip
     
     Returns:
-        List of available file information
+        List of available file information, or a sample file if nothing was uploaded yet
     """
+    stored_files = table_store.list_files(limit or settings.files_page_size, offset)
+    if stored_files or offset:
+        return stored_files
+    
     return [{
         "id": "mock-file-1",
         "filename": "sample_data.xlsx",
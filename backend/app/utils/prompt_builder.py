@@ -3,7 +3,7 @@ def create_enhanced_prompt(user_message: str, table_context: str, selected_table
     Create an enhanced prompt that instructs the agent to generate structured responses
     """
     return f"""
-You are an Excel data analysis assistant with access to calculator tools. The user has asked the following question:
+You are an Excel data analysis assistant with access to the column_stats tool, which returns precomputed column statistics instantly, and the run_analysis tool, which computes exact results over the full tables. The user has asked the following question:
 
 USER QUESTION: {user_message}
 
@@ -26,7 +26,8 @@ Generate a structured response with two parts:
 
 RESPONSE GUIDELINES:
 - For chart requests: Analyze the actual data and generate real chart configurations
-- For calculations: Use calculator tools and show actual results
+- For distinct counts, percentiles, min/max and most frequent values: Use column_stats when an approximate answer is enough
+- For calculations: Use one run_analysis call per question (filter, group, aggregate in a single pipeline) instead of doing arithmetic yourself, and show the actual results
 - For comparisons: Use real data from the tables
 - Always reference specific values from the dataset
 - Generate dynamic chart data based on actual table values
@@ -42,4 +43,20 @@ CHART COLOR GUIDELINES:
 - Use these suggested vibrant colors: ["#FF6B35", "#4ECDC4", "#45B7D1", "#96CEB4", "#FFEAA7", "#DDA0DD", "#98D8C8", "#F7DC6F", "#FF8C94", "#A8E6CF"]
 
 The response will be automatically structured according to the Pydantic model.
-"""
\ No newline at end of file
+"""
+
+def format_column_stats(stats: dict, indent: str = "") -> str:
+    """
+    Describe a table's columns in a few lines per column from its precomputed statistics
+    """
+    lines = []
+    for column_name, column in stats["columns"].items():
+        parts = [f"{column['type']}", f"{column['distinct']} distinct", f"{column['nulls']} empty"]
+        if column.get("min") is not None:
+            parts.append(f"min {column['min']}, max {column['max']}")
+        if column.get("quantiles"):
+            parts.append(f"mean {column['mean']:.4g}, median {column['quantiles']['p50']}")
+        if column.get("topValues"):
+            parts.append("top: " + ", ".join(f"{value} ({count})" for value, count, _ in column["topValues"][:5]))
+        lines.append(f"{indent}{column_name}: " + "; ".join(parts))
+    return "\n".join(lines) + "\n"
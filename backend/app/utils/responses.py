@@ -0,0 +1,98 @@
+import gzip
+from typing import Any, Dict
+import orjson
+from fastapi import Request, Response
+from pydantic import BaseModel
+from ..core.config import settings
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip is always available
+    brotli = None
+
+COLUMNAR_FORMAT = "columnar"
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(payload: Any) -> bytes:
+    """
+    Serialize a payload with orjson
+
+    Plain dicts and lists are written directly without going through
+    jsonable_encoder; Pydantic models are dumped without re-validating rows.
+    """
+    return orjson.dumps(payload, default=_default)
+
+def to_columnar(tables: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert tables from row dictionaries to one value list per column
+
+    Column names are written once per table instead of once per cell, which
+    makes large tables much smaller and faster to encode and decode.
+    """
+    columnar_tables = {}
+    for table_name, table in tables.items():
+        if isinstance(table, BaseModel):
+            table = table.model_dump()
+        table = dict(table)
+        rows = table.pop("rows", [])
+        table["columns"] = {header: [row.get(header) for row in rows] for header in table.get("headers", [])}
+        columnar_tables[table_name] = table
+    return columnar_tables
+
+def _columnar_payload(payload: Any) -> Any:
+    if isinstance(payload, list):
+        return [_columnar_payload(item) for item in payload]
+    if isinstance(payload, dict) and "tables" in payload:
+        return {**payload, "tables": to_columnar(payload["tables"])}
+    return payload
+
+def _accepted_encodings(request: Request) -> Dict[str, float]:
+    encodings = {}
+    for part in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            encodings[name.lower()] = quality
+    return encodings
+
+def table_response(request: Request, payload: Any) -> Response:
+    """
+    Build the response for endpoints returning table data
+
+    - `?format=columnar` returns each table's rows as per-column value lists
+    - The body is compressed with Brotli or gzip according to Accept-Encoding
+      once it is larger than settings.response_compression_min_bytes
+
+    Args:
+        request: The incoming request, used for format and encoding negotiation
+        payload: Dictionary or list of dictionaries with a "tables" entry
+
+    Returns:
+        Response with the encoded JSON body
+    """
+    if request.query_params.get("format") == COLUMNAR_FORMAT:
+        payload = _columnar_payload(payload)
+
+    body = dumps(payload)
+    headers = {"Vary": "Accept-Encoding"}
+
+    if len(body) >= settings.response_compression_min_bytes:
+        encodings = _accepted_encodings(request)
+        if brotli is not None and encodings.get("br", 0) > 0:
+            body = brotli.compress(body, quality=settings.response_brotli_quality)
+            headers["Content-Encoding"] = "br"
+        elif encodings.get("gzip", 0) > 0:
+            body = gzip.compress(body, compresslevel=settings.response_gzip_level)
+            headers["Content-Encoding"] = "gzip"
+
+    return Response(content=body, media_type="application/json", headers=headers)
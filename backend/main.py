@@ -3,4 +3,5 @@ from app.main import app
 from app.core.config import settings
 
 if __name__ == "__main__":
-    uvicorn.run(app, host=settings.host, port=settings.port)
\ No newline at end of file
+    # Workers are separate processes, so uvicorn needs the import string rather than the app object
+    uvicorn.run("app.main:app", host=settings.host, port=settings.port, workers=settings.workers)
\ No newline at end of file
@@ -0,0 +1,99 @@
+"""
+Benchmark of table payload serialization
+
+Compares FastAPI's default path (Pydantic TableInfo models, jsonable_encoder
+and json.dumps) with the orjson row and columnar encodings used by
+app.utils.responses, and reports the size on the wire raw, gzip and Brotli
+compressed for several table sizes.
+
+Usage (from the backend directory):
+    python scripts/bench_serialization.py --rows 100 1000 10000 100000
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from app.schemas.upload import TableInfo
+from app.utils.responses import dumps, to_columnar
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+HEADERS = ["Month", "Revenue", "Units", "Region", "Product", "Discount"]
+REGIONS = ["North", "South", "East", "West"]
+PRODUCTS = ["Laptop", "Phone", "Tablet", "Monitor"]
+
+def make_payload(row_count: int) -> dict:
+    rows = [
+        {
+            "Month": f"2024-{i % 12 + 1:02d}",
+            "Revenue": 50000 + (i * 7919) % 150000,
+            "Units": 100 + (i * 104729) % 1900,
+            "Region": REGIONS[i % len(REGIONS)],
+            "Product": PRODUCTS[(i // 3) % len(PRODUCTS)],
+            "Discount": round((i % 20) / 100, 2),
+        }
+        for i in range(row_count)
+    ]
+    return {
+        "fileId": "benchmark",
+        "filename": "benchmark.xlsx",
+        "originalName": "benchmark.xlsx",
+        "uploadedAt": "2024-03-17T10:00:00Z",
+        "tables": {
+            "SalesData": {
+                "title": "Sales Data",
+                "headers": HEADERS,
+                "rows": rows,
+                "rowCount": row_count,
+                "columnCount": len(HEADERS),
+                "dataType": {header: "number" for header in HEADERS},
+            }
+        },
+    }
+
+def default_path(payload: dict) -> bytes:
+    # What the endpoints did before: TableInfo models encoded by jsonable_encoder + json
+    tables = {name: TableInfo(**table) for name, table in payload["tables"].items()}
+    content = jsonable_encoder({**payload, "tables": tables})
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def orjson_rows(payload: dict) -> bytes:
+    return dumps(payload)
+
+def orjson_columnar(payload: dict) -> bytes:
+    return dumps({**payload, "tables": to_columnar(payload["tables"])})
+
+def timed(function, payload: dict, repeat: int) -> tuple[float, bytes]:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = function(payload)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, body
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'encoding':<16} {'ms':>9} {'raw KB':>9} {'gzip KB':>9} {'br KB':>9}")
+    for row_count in args.rows:
+        payload = make_payload(row_count)
+        for name, function in [("default", default_path), ("orjson", orjson_rows), ("orjson columnar", orjson_columnar)]:
+            elapsed_ms, body = timed(function, payload, args.repeat)
+            gzip_kb = len(gzip.compress(body, compresslevel=6)) / 1024
+            br_kb = f"{len(brotli.compress(body, quality=4)) / 1024:9.1f}" if brotli else f"{'n/a':>9}"
+            print(f"{row_count:>8} {name:<16} {elapsed_ms:>9.2f} {len(body) / 1024:>9.1f} {gzip_kb:>9.1f} {br_kb}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Load test for the non-LLM endpoints across different worker counts
+
+Starts the API with 1, 2, 4, ... uvicorn workers against a throwaway SQLite
+database, hammers /api/health and /api/files from a thread pool and prints the
+requests per second for each worker count together with the speedup over a
+single worker. Requests come from several client processes so that the load
+generator does not saturate first. Scaling should be close to linear up to the
+number of CPU cores left over after the clients.
+
+Usage (from the backend directory):
+    python scripts/load_test.py --workers 1 2 4 --requests 4000 --concurrency 64 --clients 4
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENDPOINTS = ["/api/health", "/api/files"]
+
+def wait_until_ready(base_url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"{base_url}/api/health", timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("Server did not start in time")
+
+def fetch(url: str) -> bool:
+    try:
+        with urllib.request.urlopen(url, timeout=10) as response:
+            response.read()
+            return response.status == 200
+    except OSError:
+        return False
+
+def _client_process(urls: list[str], threads: int) -> int:
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(fetch, urls)).count(False)
+
+def run_load(base_url: str, total_requests: int, concurrency: int, clients: int) -> tuple[float, int]:
+    # Several client processes so the load generator is not the bottleneck before the server is
+    urls = [f"{base_url}{ENDPOINTS[i % len(ENDPOINTS)]}" for i in range(total_requests)]
+    batches = [urls[i::clients] for i in range(clients)]
+    threads = max(1, concurrency // clients)
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=clients) as pool:
+        errors = sum(pool.map(_client_process, batches, [threads] * clients))
+    elapsed = time.perf_counter() - started
+    return total_requests / elapsed, errors
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=os.cpu_count() or 1, help="client processes")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    baseline = None
+
+    print(f"{'workers':>8} {'req/s':>10} {'speedup':>8} {'errors':>7}")
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_dir}/load_test.db")
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port),
+                 "--workers", str(workers), "--log-level", "warning"],
+                cwd=BACKEND_DIR,
+                env=env,
+            )
+            try:
+                wait_until_ready(base_url)
+                # Warm up every worker before measuring
+                run_load(base_url, args.concurrency * 4, args.concurrency, args.clients)
+                throughput, errors = run_load(base_url, args.requests, args.concurrency, args.clients)
+            finally:
+                server.terminate()
+                server.wait()
+
+        baseline = baseline or throughput
+        print(f"{workers:>8} {throughput:>10.0f} {throughput / baseline:>7.2f}x {errors:>7}")
+
+if __name__ == "__main__":
+    main()
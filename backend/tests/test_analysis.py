@@ -0,0 +1,70 @@
+import pytest
+from app.core.analysis import AnalysisError, run_pipeline
+from app.core.sketches import build_table_stats
+
+def make_table():
+    rows = [
+        {
+            "Name": "" if i % 7 == 0 else f"name{i:04d}",
+            "Revenue": None if i % 11 == 0 else (i * 37) % 1000,
+            "Region": ["North", "South", "East"][i % 3],
+        }
+        for i in range(3000)
+    ]
+    return {"headers": ["Name", "Revenue", "Region"], "rows": rows}
+
+def test_zone_map_pruning_matches_full_scan():
+    table = make_table()
+    zone_maps = {"T": build_table_stats(table, block_size=256)["zoneMaps"]}
+    filters = [
+        "Name == ''",
+        "Name < 'N'",
+        "Name >= 'name2000'",
+        "Revenue > 990",
+        "Revenue == 0",
+        "Revenue < 5 and Region == 'North'",
+        "Region in ['East', 'West']",
+        "500 <= Revenue",
+    ]
+    for expression in filters:
+        pipeline = {"table": "T", "filter": expression, "aggregate": {"n": ["count", "*"], "total": ["sum", "Revenue"]}}
+        assert run_pipeline(pipeline, {"T": table}, zone_maps=zone_maps) == run_pipeline(pipeline, {"T": table}), expression
+
+def test_descending_sort_keeps_missing_values_last():
+    table = {"headers": ["x"], "rows": [{"x": 1}, {"x": None}, {"x": 3}]}
+    result = run_pipeline({"table": "T", "sort": ["-x"]}, {"T": table})
+    assert result["rows"] == [[3], [1], [None]]
+
+def test_malformed_pipelines_are_rejected():
+    tables = {"T": {"headers": ["Region"], "rows": [{"Region": "North"}]}}
+    malformed = [
+        {"table": "T", "group_by": "Region"},
+        {"table": "T", "sort": [1]},
+        {"table": "T", "select": "Region"},
+        {"table": "T", "compute": ["x"]},
+        {"table": "T", "aggregate": [["count", "*"]]},
+        {"table": "T", "aggregate": {"n": ["count"]}},
+        {"table": "T", "limit": -1},
+        {"table": "T", "limit": "5"},
+        {"table": ["T"]},
+        {"table": "T", "groupby": ["Region"]},
+    ]
+    for pipeline in malformed:
+        with pytest.raises(AnalysisError):
+            run_pipeline(pipeline, tables)
+
+def test_limit_zero_returns_no_rows():
+    table = {"headers": ["x"], "rows": [{"x": 1}, {"x": 2}]}
+    result = run_pipeline({"table": "T", "limit": 0}, {"T": table})
+    assert result["rows"] == [] and result["rowCount"] == 2 and result["truncated"]
+
+def test_sums_are_exact_and_report_skipped_values():
+    table = {"headers": ["x", "y"], "rows": [
+        {"x": "12345678901234567890", "y": "North"},
+        {"x": "1", "y": None},
+        {"x": "n/a", "y": ""},
+    ]}
+    pipeline = {"table": "T", "aggregate": {"total": ["sum", "x"], "y_total": ["sum", "y"], "y_mean": ["mean", "y"]}}
+    result = run_pipeline(pipeline, {"T": table})
+    assert result["rows"] == [[12345678901234567891, None, None]]
+    assert result["skippedValues"] == {"total": 1, "y_total": 1, "y_mean": 1}
@@ -62,13 +62,13 @@ export const createChatSession = async (fileId: string, selectedTables: any[] =
 };
 
 // Send chat message
-export const sendChatMessage = async (sessionId: string, message: string, selectedTables: any) => {
+export const sendChatMessage = async (sessionId: string, message: string, selectedTables: any, fileId?: string) => {
   const response = await fetch(`${API_BASE_URL}/api/chat/sessions/${sessionId}/messages`, {
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
     },
-    body: JSON.stringify({ message, selectedTables }),
+    body: JSON.stringify({ message, selectedTables, fileId }),
   });
   
   if (!response.ok) {
@@ -46,8 +46,8 @@ export default function Dashboard() {
 
   // Send message mutation
   const sendMessageMutation = useMutation({
-    mutationFn: async ({ sessionId, message, selectedTables }: { sessionId: string; message: string; selectedTables: any }) => {
-      return await sendChatMessage(sessionId, message, selectedTables);
+    mutationFn: async ({ sessionId, message, selectedTables, fileId }: { sessionId: string; message: string; selectedTables: any; fileId?: string }) => {
+      return await sendChatMessage(sessionId, message, selectedTables, fileId);
     },
     onSuccess: (data) => {
       if (currentSession) {
@@ -204,7 +204,8 @@ export default function Dashboard() {
     sendMessageMutation.mutate({
       sessionId: currentSession.id,
       message,
-      selectedTables: selectedTablesData
+      selectedTables: selectedTablesData,
+      fileId: currentFile.id
     });
   };
 